@@ -1,5 +1,12 @@
 import streamlit as st
+import calendar
+import contextlib
 import datetime
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from plan_builder import load_plan, build_plan, get_plan_for_date
 import json
 
@@ -7,13 +14,149 @@ st.set_page_config(page_title="Vegetarian Breakfast Planner", page_icon="🥗",
 
 st.title("🥗 Vegetarian Breakfast & Prep Planner")
 
-# Load existing plan from Supabase
-plan = load_plan()
+# ==============================
+# 🔹 Plan cache
+# ==============================
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", "300"))
+
+
+@st.cache_data(ttl=PLAN_CACHE_TTL, show_spinner=False)
+def cached_load_plan():
+    """Load the plan once per process; reruns are served from memory until TTL or invalidation."""
+    return load_plan()
+
+
+@st.cache_data(ttl=PLAN_CACHE_TTL, show_spinner=False)
+def month_cards(year, month):
+    """Render the card for every planned day of a month in one pass, keyed by date."""
+    plan = cached_load_plan()
+    first = datetime.date(year, month, 1)
+    num_days = calendar.monthrange(year, month)[1]
+
+    # One lookup per day, plus the first day of next month for its evening prep
+    day_plans = [
+        get_plan_for_date(first + datetime.timedelta(days=i), plan)
+        for i in range(num_days + 1)
+    ]
+
+    cards = {}
+    for i in range(num_days):
+        day_plan, next_day_plan = day_plans[i], day_plans[i + 1]
+        if not day_plan:
+            continue
+        prep = next_day_plan.get('prep', 'No prep') if next_day_plan else "No prep (end of plan)."
+        cards[first + datetime.timedelta(days=i)] = (
+            f"**{day_plan.get('breakfast', 'N/A')}**\n\n"
+            f"{day_plan.get('method', 'N/A')}\n\n"
+            f"🌙 {prep}"
+        )
+    return cards
+
+
+def clear_plan_cache():
+    """Invalidate the cached plan and everything rendered from it."""
+    cached_load_plan.clear()
+    month_cards.clear()
+
+
+# ==============================
+# 🔹 Background generation jobs
+# ==============================
+JOBS_DB_PATH = os.getenv("PLAN_JOBS_DB", "plan_jobs.db")
+JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "4"))
+JOB_POLL_SECONDS = 2
+
+# In-progress statuses and the message shown while polling
+JOB_STAGES = {
+    "queued": "Waiting for a free worker...",
+    "generating": "Generating your plan...",
+    "saving": "Saving your plan to Supabase...",
+}
+
+
+def _jobs_db():
+    return contextlib.closing(sqlite3.connect(JOBS_DB_PATH))
+
+
+@st.cache_resource
+def _job_runner():
+    # One pool per server process, shared by every session; the job table is created here once
+    with _jobs_db() as conn, conn:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS plan_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                message TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="plan-job")
+
+
+def _update_job(job_id, status, message=None):
+    with _jobs_db() as conn, conn:
+        conn.execute(
+            "UPDATE plan_jobs SET status = ?, message = ?, updated_at = ? WHERE id = ?",
+            (status, message, time.time(), job_id),
+        )
+
+
+def get_job(job_id):
+    """Return the persisted state of a generation job, or None if unknown."""
+    _job_runner()  # make sure the job table exists
+    with _jobs_db() as conn:
+        row = conn.execute(
+            "SELECT status, message FROM plan_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {"status": row[0], "message": row[1]}
+
+
+def _run_generation(job_id, preferences):
+    try:
+        from plan_builder import build_plan_prompt
+        _update_job(job_id, "generating")
+        plan_json = build_plan_prompt(preferences)  # ask Gemini for JSON directly
+        _update_job(job_id, "saving")
+        result = build_plan(plan_json)  # save to Supabase
+
+        if result.get("status") == "success":
+            # A new plan was written: drop the cached copy for every session
+            clear_plan_cache()
+            _update_job(job_id, "success")
+        else:
+            _update_job(job_id, "error", result.get("message", "Unknown error"))
+    except Exception as e:
+        _update_job(job_id, "error", str(e))
+
+
+def submit_generation(preferences):
+    """Queue a plan generation in the background and return its job id."""
+    runner = _job_runner()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _jobs_db() as conn, conn:
+        conn.execute(
+            "INSERT INTO plan_jobs (id, status, message, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, "queued", None, now, now),
+        )
+    runner.submit(_run_generation, job_id, preferences)
+    return job_id
+
+
+# Load existing plan (cached across reruns and sessions)
+plan = cached_load_plan()
 
 # Session state to hold full plan JSON from build_plan
 if "full_plan" not in st.session_state:
     st.session_state.full_plan = None
 
+# Session state to hold the id of the generation job this session submitted
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+
 # Preferences input box
 preferences = st.text_area(
     "Enter your meal preferences:",
@@ -21,22 +164,31 @@ preferences = st.text_area(
     height=100
 )
 
-if st.button("Generate Monthly Plan"):
+job_running = False
+if st.session_state.job_id:
+    job = get_job(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+    elif job["status"] in JOB_STAGES:
+        job_running = True
+        st.info(f"⏳ {JOB_STAGES[job['status']]}")
+    else:
+        st.session_state.job_id = None
+        if job["status"] == "success":
+            st.success("✅ Plan generated and saved to Supabase!")
+            # Reload latest plan
+            plan = cached_load_plan()
+            st.session_state.full_plan = plan
+        else:
+            st.error(f"Error: {job.get('message') or 'Unknown error'}")
+
+if st.button("Generate Monthly Plan", disabled=job_running):
     if not preferences.strip():
         st.error("Please enter your preferences before generating the plan.")
     else:
-        with st.spinner("Generating your plan..."):
-            from plan_builder import build_plan_prompt
-            plan_json = build_plan_prompt(preferences)  # ask Gemini for JSON directly
-            result = build_plan(plan_json)  # save to Supabase
-
-            if result.get("status") == "success":
-                st.success("✅ Plan generated and saved to Supabase!")
-                # Reload latest plan
-                plan = load_plan()
-                st.session_state.full_plan = plan
-            else:
-                st.error(f"Error: {result.get('message','Unknown error')}")
+        st.session_state.job_id = submit_generation(preferences)
+        job_running = True
+        st.info(f"⏳ {JOB_STAGES['queued']}")
 
 # Show today's plan
 if plan:
@@ -77,3 +229,33 @@ if plan:
             st.markdown("**Evening Prep:** No prep (end of plan).")
     else:
         st.warning("⚠️ No plan found for the selected date.")
+
+# Calendar view
+if plan:
+    st.subheader("🗓 Calendar")
+    view = st.radio("View", ["Month", "Week"], horizontal=True)
+    anchor = st.date_input("Show calendar for", value=datetime.date.today(), key="calendar_anchor")
+
+    weeks = calendar.Calendar().monthdatescalendar(anchor.year, anchor.month)
+    if view == "Week":
+        weeks = [week for week in weeks if anchor in week]
+
+    # Materialize cards lazily, only for the months actually on screen
+    cards = {}
+    for year, month in sorted({(d.year, d.month) for week in weeks for d in week}):
+        if view == "Month" and (year, month) != (anchor.year, anchor.month):
+            continue
+        cards.update(month_cards(year, month))
+
+    for col, day_name in zip(st.columns(7), calendar.day_abbr):
+        col.markdown(f"**{day_name}**")
+    for week in weeks:
+        for col, day in zip(st.columns(7), week):
+            if view == "Month" and day.month != anchor.month:
+                continue
+            col.markdown(f"**{day.day}**\n\n{cards.get(day, '—')}")
+
+# Poll the background job once the page has rendered
+if job_running:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
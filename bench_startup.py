@@ -0,0 +1,48 @@
+# bench_startup.py
+import sys
+import time
+import datetime
+import argparse
+import statistics
+import subprocess
+
+# Modules the CLI jobs import on startup
+ENTRY_POINTS = ["send_whatsapp", "plan_builder"]
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def time_import(module: str, runs: int):
+    """Import `module` in `runs` fresh interpreters and return each import time in seconds."""
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            capture_output=True, text=True, check=True
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--output", type=str, default="bench_output.txt", help="File results are appended to")
+    args = parser.parse_args()
+
+    lines = [f"# startup benchmark {datetime.datetime.now().isoformat(timespec='seconds')} (python {sys.version.split()[0]})"]
+    for module in ENTRY_POINTS:
+        try:
+            timings = time_import(module, args.runs)
+        except subprocess.CalledProcessError as e:
+            lines.append(f"{module}: import failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        lines.append(
+            f"{module}: median {statistics.median(timings) * 1000:.1f} ms, "
+            f"min {min(timings) * 1000:.1f} ms over {len(timings)} runs"
+        )
+
+    report = "\n".join(lines)
+    print(report)
+    with open(args.output, "a") as f:
+        f.write(report + "\n")
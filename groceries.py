@@ -0,0 +1,237 @@
+# groceries.py
+import re
+from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+
+# ==============================
+# 🔹 Units
+# ==============================
+# unit spelling -> (base unit, factor to base)
+UNITS = {
+    "mg": ("g", 0.001),
+    "g": ("g", 1), "gm": ("g", 1), "gms": ("g", 1), "gram": ("g", 1), "grams": ("g", 1),
+    "kg": ("g", 1000), "kgs": ("g", 1000), "kilo": ("g", 1000), "kilos": ("g", 1000),
+    "ml": ("ml", 1),
+    "l": ("ml", 1000), "litre": ("ml", 1000), "litres": ("ml", 1000),
+    "liter": ("ml", 1000), "liters": ("ml", 1000),
+    "tsp": ("ml", 5), "teaspoon": ("ml", 5), "teaspoons": ("ml", 5),
+    "tbsp": ("ml", 15), "tablespoon": ("ml", 15), "tablespoons": ("ml", 15),
+    "cup": ("ml", 240), "cups": ("ml", 240),
+    "pc": ("", 1), "pcs": ("", 1), "piece": ("", 1), "pieces": ("", 1),
+    "no": ("", 1), "nos": ("", 1),
+    "bunch": ("bunch", 1), "bunches": ("bunch", 1),
+    "pinch": ("pinch", 1), "pinches": ("pinch", 1),
+    "clove": ("clove", 1), "cloves": ("clove", 1),
+}
+
+# Serving sizes ("1 bowl", "serves 2") describe the dish, not a grocery, so
+# they are counted as servings of the meal's item
+SERVINGS = [
+    "bowl", "bowls", "plate", "plates", "serving", "servings", "serve", "serves",
+    "glass", "glasses", "katori", "katoris", "portion", "portions", "helping", "helpings",
+]
+UNITS.update({noun: ("serving", 1) for noun in SERVINGS})
+
+# display units that take an 's' when the amount is not exactly 1
+PLURAL_UNITS = {"cup", "serving"}
+
+# base unit -> [(display unit, size in base units, exact)] tried in order when
+# printing totals; exact units are used only when they divide the total evenly
+# into fewer than 16 of them (so 300 ml stays "300 ml", not "20 tbsp")
+DISPLAY_UNITS = {
+    "g": [("kg", 1000, False)],
+    "ml": [("cup", 240, True), ("l", 1000, False), ("tbsp", 15, True), ("tsp", 5, True)],
+}
+
+# plurals the suffix rules in normalize_ingredient would get wrong
+IRREGULAR_PLURALS = {
+    "leaves": "leaf", "loaves": "loaf", "halves": "half",
+    "chillies": "chilli", "chilies": "chili",
+    "cookies": "cookie", "brownies": "brownie",
+}
+
+UNICODE_FRACTIONS = {"½": "1/2", "¼": "1/4", "¾": "3/4", "⅓": "1/3", "⅔": "2/3"}
+
+_AMOUNT = r"\d+(?:\.\d+)?(?:\s+\d+/\d+|/\d+)?"
+_UNIT = "|".join(sorted(map(re.escape, UNITS), key=len, reverse=True))
+
+# "200 g paneer", "1 1/2 cups of poha", "2 tomatoes", or a bare "1 cup" / "2 1/2"
+LEADING = re.compile(
+    rf"^(?P<amount>{_AMOUNT})(?:\s*-\s*{_AMOUNT})?\s*(?:(?P<unit>{_UNIT})\b\.?)?\s*(?:of\s+)?(?P<ingredient>.*)$",
+    re.IGNORECASE,
+)
+# "paneer 200 g", "paneer - 200g", "paneer (200 g)"
+TRAILING = re.compile(
+    rf"^(?P<ingredient>.+?)\s*[-:(]?\s*(?P<amount>{_AMOUNT})\s*(?:(?P<unit>{_UNIT})\b\.?)?\s*\)?$",
+    re.IGNORECASE,
+)
+# "1,000 g" -> "1000 g" before splitting, and never split on a comma between digits
+# "1 cup (240 ml)": a parenthesised conversion next to an amount is dropped
+PARENS = re.compile(r"\s*\([^)]*\)")
+THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+SEPARATORS = re.compile(r"\s*(?:(?<!\d),|,(?!\d)|;|\+|\n|\band\b)\s*", re.IGNORECASE)
+
+
+# ---------------- Parsing ---------------- #
+def _parse_amount(text: str):
+    """'1', '1.5', '1/2' or '1 1/2' as a float; None for nonsense like '1/0'."""
+    total = Fraction(0)
+    try:
+        for part in text.split():
+            total += Fraction(part)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return float(total)
+
+
+def _plain(text: str) -> str:
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=None)
+def normalize_ingredient(name: str) -> str:
+    """Lowercase, collapse whitespace and singularize the last word so spellings group together."""
+    words = name.lower().strip(" .-:()").split()
+    if not words:
+        return ""
+    last = words[-1]
+    if last in IRREGULAR_PLURALS:
+        last = IRREGULAR_PLURALS[last]
+    elif last.endswith(("sses", "shes", "ches", "xes")):
+        last = last[:-2]
+    elif last.endswith("ies") and len(last) > 4:
+        last = last[:-3] + "y"
+    elif last.endswith("oes"):
+        last = last[:-2]
+    elif last.endswith("s") and len(last) > 3 and not last.endswith(("ss", "us")):
+        last = last[:-1]
+    words[-1] = last
+    return " ".join(words)
+
+
+@lru_cache(maxsize=None)
+def _parse_text(text: str):
+    """Parse one quantity text into entries, independent of the meal it came from.
+
+    Parts that must be credited to the meal's item come back as
+    (None, amount, base_unit, raw_text). Returns (entries, has_pending).
+    Plans repeat the same quantity strings, so results are cached per text.
+    """
+    for fraction, replacement in UNICODE_FRACTIONS.items():
+        text = text.replace(fraction, f" {replacement}")
+    text = THOUSANDS.sub("", text)
+
+    parsed = []
+    has_pending = False
+    for part in SEPARATORS.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        outside = PARENS.sub("", part).strip()
+        if any(c.isdigit() for c in outside):
+            part = outside
+        match = LEADING.match(part) or TRAILING.match(part)
+        amount = _parse_amount(match.group("amount")) if match else None
+        if amount is None:
+            parsed.append((_plain(part), None, None))
+            continue
+
+        ingredient = normalize_ingredient(match.group("ingredient"))
+        unit = (match.group("unit") or "").lower()
+        if not ingredient or ingredient in UNITS:
+            # "serves 2": the unit word came where the ingredient would be
+            base_unit, factor = UNITS[unit or ingredient or "pc"]
+            parsed.append((None, amount * factor, base_unit, _plain(part)))
+            has_pending = True
+            continue
+
+        base_unit, factor = UNITS[unit or "pc"]
+        parsed.append((ingredient, amount * factor, base_unit))
+    return tuple(parsed), has_pending
+
+
+def parse_ingredients(text: str, default_ingredient: str = None):
+    """Split free text into (ingredient, amount, base_unit) tuples.
+
+    A part that is only an amount ("1 cup", "200 g") or a serving size
+    ("1 bowl", "serves 2") is credited to `default_ingredient`, usually the
+    meal's item. Parts with no usable amount, or an amount with nothing to
+    credit it to, come back as (text, None, None).
+    """
+    entries, has_pending = _parse_text(text)
+    if not has_pending:
+        return entries
+    item = normalize_ingredient(default_ingredient) if default_ingredient else None
+    return tuple(
+        entry if entry[0] is not None
+        else (item, entry[1], entry[2]) if item
+        else (entry[3], None, None)
+        for entry in entries
+    )
+
+
+@lru_cache(maxsize=None)
+def _prep_entry(prep: str):
+    return (_plain(prep), None, None)
+
+
+def _ingredients(item, quantity, prep):
+    entries = parse_ingredients(quantity, item) if quantity else ()
+    if prep:
+        entries += (_prep_entry(prep),)
+    return entries
+
+
+def meal_ingredients(meal: dict):
+    """Ingredients for one meal: its parsed `quantity` plus its `prep` task as-is."""
+    return _ingredients(meal.get("item"), meal.get("quantity"), meal.get("prep"))
+
+
+# ---------------- Aggregation ---------------- #
+def aggregate(meals):
+    """Sum ingredient amounts across meals.
+
+    Returns {ingredient: {base_unit: total}}; parts without an amount are counted
+    under the None unit. Ingredients keep the order they first appear in.
+    Identical meals are counted first, so parsing and summing scale with the
+    number of distinct meals rather than the length of the window.
+    """
+    counts = Counter((m.get("item"), m.get("quantity"), m.get("prep")) for m in meals)
+    totals = {}
+    for key, n in counts.items():
+        for ingredient, amount, unit in _ingredients(*key):
+            per_unit = totals.setdefault(ingredient, {})
+            per_unit[unit] = per_unit.get(unit, 0) + (amount * n if amount is not None else n)
+    return totals
+
+
+def _format_amount(amount: float, unit: str) -> str:
+    for display_unit, size, exact in DISPLAY_UNITS.get(unit, []):
+        if amount < size:
+            continue
+        if not exact or (round(amount % size, 6) == 0 and amount < size * 16):
+            amount, unit = amount / size, display_unit
+            break
+    if unit in PLURAL_UNITS and amount != 1:
+        unit += "s"
+    number = f"{amount:.2f}".rstrip("0").rstrip(".")
+    return f"{number} {unit}".strip()
+
+
+def format_grocery_list(totals):
+    """One compact line per ingredient, e.g. 'paneer: 1.2 kg' or 'Soak chana overnight (x3)'."""
+    lines = []
+    for ingredient, per_unit in totals.items():
+        amounts = [_format_amount(amount, unit) for unit, amount in per_unit.items() if unit is not None]
+        line = f"{ingredient}: {' + '.join(amounts)}" if amounts else ingredient
+        count = per_unit.get(None, 0)
+        if count > 1 or (count and amounts):
+            line += f" (x{count})"
+        lines.append(line)
+    return lines
+
+
+def grocery_list(meals):
+    """Aggregate a window of meals into a compact grocery list."""
+    return format_grocery_list(aggregate(meals))
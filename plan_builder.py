@@ -2,7 +2,7 @@
 import os
 import datetime
 import argparse
-from twilio.rest import Client
+import threading
 
 # ==============================
 # 🔹 Twilio Setup
@@ -11,7 +11,19 @@ account_sid = os.getenv("TWILIO_ACCOUNT_SID")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 from_whatsapp_number = "whatsapp:+14155238886"  # Twilio sandbox
 
-client = Client(account_sid, auth_token)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared Twilio client, constructing it the first time it is needed."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from twilio.rest import Client
+                _client = Client(account_sid, auth_token)
+    return _client
 
 # Recipients (comma-separated env var recommended)
 recipients = os.getenv("RECIPIENTS", "").split(",") if os.getenv("RECIPIENTS") else []
@@ -22,7 +34,7 @@ def send_whatsapp_message(body: str):
     """Send a WhatsApp message to all recipients."""
     for number in recipients:
         if number.strip():
-            client.messages.create(
+            get_client().messages.create(
                 body=body,
                 from_=from_whatsapp_number,
                 to=f"whatsapp:{number.strip()}"
@@ -1,9 +1,17 @@
 # notifier.py
 import os
+import sys
+import time
+import heapq
+import sqlite3
+import hashlib
 import datetime
 import argparse
-from twilio.rest import Client
-from plan_builder import load_plan, get_plan_for_date
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from groceries import grocery_list
+
+# twilio and plan_builder are imported on first use so each job only pays for what it needs
 
 # ==============================
 # 🔹 Twilio Setup
@@ -12,28 +20,217 @@ account_sid = os.getenv("TWILIO_ACCOUNT_SID")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 from_whatsapp_number = "whatsapp:+14155238886"  # Twilio sandbox
 
-client = Client(account_sid, auth_token)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Create the Twilio client on first use and reuse it for the life of the process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from twilio.rest import Client
+                _client = Client(account_sid, auth_token)
+    return _client
+
 
 # Recipients (comma-separated env var recommended)
 recipients = os.getenv("RECIPIENTS", "+918624925429,+917984814938").split(",")
 
+# Fan-out limits (match these to the Twilio sender's messages-per-second)
+max_concurrency = int(os.getenv("WHATSAPP_MAX_CONCURRENCY", "8"))
+rate_limit_per_sec = float(os.getenv("WHATSAPP_RATE_LIMIT", "10"))
+if rate_limit_per_sec <= 0:
+    raise ValueError("⚠️ WHATSAPP_RATE_LIMIT must be greater than 0")
+
+# Delivery ledger (keeps re-runs of a job from resending what already went out)
+ledger_path = os.getenv("DELIVERY_LEDGER_PATH", "delivery_ledger.db")
+
+# --serve mode: how long a loaded plan is reused before reloading it
+plan_refresh_seconds = int(os.getenv("PLAN_REFRESH_SECONDS", "900"))
+# --serve mode: delay before retrying a job that failed, while its window is still current
+job_retry_seconds = int(os.getenv("JOB_RETRY_SECONDS", "900"))
+
+
+# ---------------- Ledger ---------------- #
+def _ledger():
+    conn = sqlite3.connect(ledger_path)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS deliveries (
+            job TEXT NOT NULL,
+            date TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            sid TEXT,
+            sent_at TEXT NOT NULL,
+            PRIMARY KEY (job, date, recipient, content_hash)
+        )"""
+    )
+    return conn
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def delivered_recipients(conn, job: str, date: str, body_hash: str) -> set:
+    """Recipients that already received this exact message for (job, date)."""
+    rows = conn.execute(
+        "SELECT recipient FROM deliveries WHERE job = ? AND date = ? AND content_hash = ?",
+        (job, date, body_hash),
+    )
+    return {row[0] for row in rows}
+
+
+def record_delivery(conn, job: str, date: str, recipient: str, body_hash: str, sid: str):
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO deliveries VALUES (?, ?, ?, ?, ?, ?)",
+            (job, date, recipient, body_hash, sid, datetime.datetime.now().isoformat()),
+        )
+
 
 # ---------------- Helper ---------------- #
-def send_whatsapp_message(body: str):
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` acquisitions per second, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _send_one(body: str, number: str, bucket: TokenBucket):
+    bucket.acquire()
+    try:
+        message = get_client().messages.create(
+            body=body,
+            from_=from_whatsapp_number,
+            to=f"whatsapp:{number}"
+        )
+        return number, True, message.sid
+    except Exception as e:
+        return number, False, str(e)
+
+
+def recipient_numbers():
+    return [number.strip() for number in recipients if number.strip()]
+
+
+def dispatch(messages: dict, job: str = None, date: datetime.date = None):
+    """Send each rendered body to its recipients through one shared worker pool.
+
+    `messages` maps a distinct body to the recipients that should receive it, so
+    each body is rendered and hashed once however many recipients share it.
+    When `job` and `date` are given, recipients already recorded in the delivery
+    ledger for a body are skipped and each success is recorded.
+    Returns a list of (number, ok, sid_or_error) tuples, one per message sent.
+    """
+    conn = _ledger() if job and date else None
+
+    queue = []
+    skipped = 0
+    for body, numbers in messages.items():
+        body_hash = content_hash(body)
+        if conn is not None:
+            already_sent = delivered_recipients(conn, job, date.isoformat(), body_hash)
+            skipped += sum(1 for number in numbers if number in already_sent)
+            numbers = [number for number in numbers if number not in already_sent]
+        queue.extend((body, body_hash, number) for number in numbers)
+
+    if skipped:
+        print(f"↩ Skipping {skipped} recipient(s) already sent this {job} message")
+
+    bucket = TokenBucket(rate_limit_per_sec)
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(queue) or 1))) as pool:
+        futures = {
+            pool.submit(_send_one, body, number, bucket): body_hash
+            for body, body_hash, number in queue
+        }
+        for future in as_completed(futures):
+            number, ok, sid = future.result()
+            results.append((number, ok, sid))
+            if ok and conn is not None:
+                record_delivery(conn, job, date.isoformat(), number, futures[future], sid)
+
+    if conn is not None:
+        conn.close()
+
+    failed = [(number, error) for number, ok, error in results if not ok]
+    print(f"✅ WhatsApp message sent to {len(results) - len(failed)} recipient(s)")
+    for number, error in failed:
+        print(f"❌ Failed to send to {number}: {error}")
+    return results
+
+
+def send_whatsapp_message(body: str, job: str = None, date: datetime.date = None):
     """Send a WhatsApp message to all recipients."""
-    for number in recipients:
-        if number.strip():
-            client.messages.create(
-                body=body,
-                from_=from_whatsapp_number,
-                to=f"whatsapp:{number.strip()}"
-            )
-    print(f"✅ WhatsApp message sent to {len(recipients)} recipient(s)")
+    return dispatch({body: recipient_numbers()}, job=job, date=date)
+
+
+def count_failures(results) -> int:
+    return sum(1 for _, ok, _ in results if not ok)
+
+
+# ---------------- Templates ---------------- #
+DAILY_HEADER = "🥗 *Today's Plan* ({date:%d %B %Y})"
+MEAL_TEMPLATE = "🍽 {meal_type}: {item}\n📋 Method: {method}"
+MEAL_PREP_TEMPLATE = "\n🛠 Prep: {prep}"
+EVENING_PREP_TEMPLATE = "🌙 *Evening Prep for Tomorrow*: {preps}"
+GROCERY_HEADERS = {
+    "weekly": "🛒 *Weekly Grocery List*",
+    "monthly": "📦 *Monthly Grocery List*",
+}
+
+
+def render_daily_plan(today: datetime.date, today_plan, tomorrow_plan) -> str:
+    message_lines = [DAILY_HEADER.format(date=today)]
+
+    for meal in today_plan:
+        msg = MEAL_TEMPLATE.format(
+            meal_type=meal.get("meal_type", "").capitalize(),
+            item=meal.get("item", "N/A"),
+            method=meal.get("method", "N/A"),
+        )
+        if meal.get("prep"):
+            msg += MEAL_PREP_TEMPLATE.format(prep=meal["prep"])
+        message_lines.append(msg)
+
+    if tomorrow_plan:
+        tomorrow_preps = [m.get("prep") for m in tomorrow_plan if m.get("prep")]
+        if tomorrow_preps:
+            message_lines.append(EVENING_PREP_TEMPLATE.format(preps=", ".join(tomorrow_preps)))
+
+    return "\n\n".join(message_lines)
+
+
+def render_grocery_list(job: str, groceries) -> str:
+    return GROCERY_HEADERS[job] + "\n" + "\n".join([f"- {item}" for item in groceries])
 
 
 # ---------------- Notifications ---------------- #
-def send_daily_plan():
-    plan = load_plan()
+# Each job returns the number of recipients it failed to reach (0 when nothing was due)
+def send_daily_plan(plan=None):
+    from plan_builder import load_plan, get_plan_for_date
+    plan = plan if plan is not None else load_plan()
     today = datetime.date.today()
     tomorrow = today + datetime.timedelta(days=1)
 
@@ -41,67 +238,213 @@ def send_daily_plan():
     tomorrow_plan = get_plan_for_date(tomorrow, plan)
 
     if today_plan:
-        message_lines = [f"🥗 *Today's Plan* ({today.strftime('%d %B %Y')})"]
-
-        for meal in today_plan:
-            meal_type = meal.get("meal_type", "").capitalize()
-            item = meal.get("item", "N/A")
-            method = meal.get("method", "N/A")
-            prep = meal.get("prep", None)
-
-            msg = f"🍽 {meal_type}: {item}\n📋 Method: {method}"
-            if prep:
-                msg += f"\n🛠 Prep: {prep}"
-            message_lines.append(msg)
-
-        if tomorrow_plan:
-            tomorrow_preps = [m.get("prep") for m in tomorrow_plan if m.get("prep")]
-            if tomorrow_preps:
-                message_lines.append(
-                    f"🌙 *Evening Prep for Tomorrow*: {', '.join(tomorrow_preps)}"
-                )
-
-        send_whatsapp_message("\n\n".join(message_lines))
+        body = render_daily_plan(today, today_plan, tomorrow_plan)
+        return count_failures(dispatch({body: recipient_numbers()}, job="daily", date=today))
     else:
         print("⚠ No plan found for today.")
+        return 0
 
 
-def send_weekly_groceries():
-    plan = load_plan()
+def send_weekly_groceries(plan=None):
+    from plan_builder import load_plan
+    plan = plan if plan is not None else load_plan()
     today = datetime.date.today()
 
     week_num = (today.day - 1) // 7 + 1
     week_key = f"week{week_num}"
 
-    groceries = []
+    week_meals = []
     if week_key in plan:
         for _, meals in plan[week_key].items():
-            for m in meals:
-                if m.get("prep"):
-                    groceries.append(m["prep"])
+            week_meals.extend(meals)
+    groceries = grocery_list(week_meals)
 
     if groceries:
-        message = "🛒 *Weekly Grocery List*\n" + "\n".join([f"- {item}" for item in groceries])
-        send_whatsapp_message(message)
+        body = render_grocery_list("weekly", groceries)
+        week_start = today.replace(day=(week_num - 1) * 7 + 1)
+        return count_failures(dispatch({body: recipient_numbers()}, job="weekly", date=week_start))
     else:
         print("⚠ No groceries found for this week.")
+        return 0
 
 
-def send_monthly_groceries():
-    plan = load_plan()
-    groceries = []
+def send_monthly_groceries(plan=None):
+    from plan_builder import load_plan
+    plan = plan if plan is not None else load_plan()
+    today = datetime.date.today()
+    month_meals = []
 
     for week, days in plan.items():
         for _, meals in days.items():
-            for m in meals:
-                if m.get("prep"):
-                    groceries.append(m["prep"])
+            month_meals.extend(meals)
+    groceries = grocery_list(month_meals)
 
     if groceries:
-        message = "📦 *Monthly Grocery List*\n" + "\n".join([f"- {item}" for item in groceries])
-        send_whatsapp_message(message)
+        body = render_grocery_list("monthly", groceries)
+        return count_failures(dispatch({body: recipient_numbers()}, job="monthly", date=today.replace(day=1)))
     else:
         print("⚠ No groceries found for this month.")
+        return 0
+
+
+# ---------------- Scheduler (--serve) ---------------- #
+JOBS = {
+    "daily": send_daily_plan,
+    "weekly": send_weekly_groceries,
+    "monthly": send_monthly_groceries,
+}
+
+# Local times each job fires. Daily keeps the notifier workflow's four cron slots:
+# the delivery ledger makes 14:00/18:00/20:00 retry points that only reach
+# recipients the 10:00 run missed, or resend if the plan was regenerated.
+SCHEDULE = {
+    "daily": lambda day: [datetime.time(10, 0), datetime.time(14, 0), datetime.time(18, 0), datetime.time(20, 0)],
+    "weekly": lambda day: [datetime.time(9, 0)] if day.day in (1, 8, 15, 22, 29) else [],
+    "monthly": lambda day: [datetime.time(9, 0)] if day.day == 1 else [],
+}
+
+
+def job_window(job: str, day: datetime.date):
+    """The period a job's message covers; jobs always render the window containing today."""
+    if job == "daily":
+        return day
+    if job == "weekly":
+        return day.year, day.month, (day.day - 1) // 7 + 1
+    return day.year, day.month
+
+
+def next_slot(job: str, after: datetime.datetime) -> datetime.datetime:
+    """First scheduled run of `job` strictly after `after`."""
+    for offset in range(32):
+        day = after.date() + datetime.timedelta(days=offset)
+        for t in SCHEDULE[job](day):
+            slot = datetime.datetime.combine(day, t)
+            if slot > after:
+                return slot
+
+
+def last_slot(job: str, at: datetime.datetime) -> datetime.datetime:
+    """Most recent scheduled run of `job` at or before `at`."""
+    for offset in range(32):
+        day = at.date() - datetime.timedelta(days=offset)
+        for t in sorted(SCHEDULE[job](day), reverse=True):
+            slot = datetime.datetime.combine(day, t)
+            if slot <= at:
+                return slot
+
+
+def _now() -> datetime.datetime:
+    # The scheduler reads the clock only through here
+    return datetime.datetime.now()
+
+
+def _job_runs():
+    conn = _ledger()
+    conn.execute("CREATE TABLE IF NOT EXISTS job_runs (job TEXT PRIMARY KEY, last_slot TEXT NOT NULL)")
+    return conn
+
+
+def _last_run(conn, job: str):
+    row = conn.execute("SELECT last_slot FROM job_runs WHERE job = ?", (job,)).fetchone()
+    return datetime.datetime.fromisoformat(row[0]) if row else None
+
+
+def _mark_run(conn, job: str, slot: datetime.datetime):
+    with conn:
+        conn.execute(
+            """INSERT INTO job_runs VALUES (?, ?)
+               ON CONFLICT (job) DO UPDATE SET last_slot = max(last_slot, excluded.last_slot)""",
+            (job, slot.isoformat()),
+        )
+
+
+def serve():
+    """Stay resident and run jobs on SCHEDULE.
+
+    On startup, a slot missed while the notifier was down is caught up only if
+    its window (day / week / month) is still current; the same applies to
+    slots passed while the machine slept. A failed run is not recorded and is
+    retried after JOB_RETRY_SECONDS while its window lasts.
+    """
+    conn = _job_runs()
+    plan_cache = {"plan": None, "loaded_at": 0.0}
+
+    def current_plan():
+        from plan_builder import load_plan
+        if plan_cache["plan"] is None or time.monotonic() - plan_cache["loaded_at"] > plan_refresh_seconds:
+            plan_cache["plan"] = load_plan()
+            plan_cache["loaded_at"] = time.monotonic()
+        return plan_cache["plan"]
+
+    def run(job, slot):
+        """Run `job` for `slot`; returns True (and records the slot) only on full success."""
+        print(f"⏰ Running {job} job for {slot:%Y-%m-%d %H:%M}")
+        try:
+            failures = JOBS[job](current_plan())
+        except Exception as e:
+            print(f"❌ {job} job failed: {e}")
+            return False
+        if failures:
+            print(f"❌ {job} job failed for {failures} recipient(s)")
+            return False
+        _mark_run(conn, job, slot)
+        return True
+
+    # Heap of (fire_at, job, slot, is_retry); regular entries fire at their slot
+    queue = []
+    retrying = set()
+
+    def schedule_retry(job, slot):
+        if job not in retrying:
+            retrying.add(job)
+            fire_at = _now() + datetime.timedelta(seconds=job_retry_seconds)
+            heapq.heappush(queue, (fire_at, job, slot, True))
+
+    now = _now()
+    for job in JOBS:
+        missed = last_slot(job, now)
+        last_run = _last_run(conn, job)
+        if last_run is None:
+            # First start: nothing was missed by this notifier, start from the next slot
+            if missed:
+                _mark_run(conn, job, missed)
+        elif missed and last_run < missed and job_window(job, missed.date()) == job_window(job, now.date()):
+            if not run(job, missed):
+                schedule_retry(job, missed)
+        slot = next_slot(job, now)
+        heapq.heappush(queue, (slot, job, slot, False))
+
+    print("🟢 Notifier running. Press Ctrl+C to stop.")
+    try:
+        while queue:
+            fire_at, job, slot, is_retry = queue[0]
+            remaining = (fire_at - _now()).total_seconds()
+            if remaining > 0:
+                # Wake at least once a minute so clock changes are picked up
+                time.sleep(min(remaining, 60))
+                continue
+            heapq.heappop(queue)
+            now = _now()
+            if is_retry:
+                retrying.discard(job)
+            else:
+                latest = last_slot(job, now)
+                if latest and latest > slot:
+                    # A newer slot also passed while asleep; only that one is worth running
+                    heapq.heappush(queue, (latest, job, latest, False))
+                    continue
+                following = next_slot(job, now)
+                heapq.heappush(queue, (following, job, following, False))
+
+            if job_window(job, slot.date()) != job_window(job, now.date()):
+                # e.g. the machine slept through the slot; its message is stale now
+                print(f"⏭ Skipping {job} job for {slot:%Y-%m-%d %H:%M}: its window has passed")
+            elif not run(job, slot):
+                schedule_retry(job, slot)
+    except KeyboardInterrupt:
+        print("🛑 Notifier stopped.")
+    finally:
+        conn.close()
 
 
 # ---------------- CLI Entry ---------------- #
@@ -110,16 +453,23 @@ if __name__ == "__main__":
     parser.add_argument(
         "--job",
         type=str,
-        required=True,
         help="Which job to run: daily | weekly | monthly"
     )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Stay resident and run all jobs on their schedule"
+    )
     args = parser.parse_args()
 
-    if args.job == "daily":
-        send_daily_plan()
-    elif args.job == "weekly":
-        send_weekly_groceries()
-    elif args.job == "monthly":
-        send_monthly_groceries()
+    if args.serve:
+        serve()
+    elif not args.job:
+        parser.error("one of --job or --serve is required")
+    elif args.job in JOBS:
+        # Exit non-zero when any recipient failed so the workflow run shows it
+        if JOBS[args.job]():
+            sys.exit(1)
     else:
         print("❌ Invalid job type. Use: daily | weekly | monthly")
+        sys.exit(1)
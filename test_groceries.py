@@ -0,0 +1,149 @@
+import pytest
+
+from groceries import grocery_list, meal_ingredients, normalize_ingredient, parse_ingredients
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("200 g paneer", ("paneer", 200.0, "g")),
+    ("1 1/2 cups of poha", ("poha", 360.0, "ml")),
+    ("2 tomatoes", ("tomato", 2.0, "")),
+    ("1 kg rice", ("rice", 1000.0, "g")),
+    ("½ tsp salt", ("salt", 2.5, "ml")),
+    ("1-2 green chillies", ("green chilli", 1.0, "")),
+    ("2 ginger", ("ginger", 2.0, "")),
+])
+def test_leading_amounts(text, expected):
+    assert parse_ingredients(text) == (expected,)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("paneer 200g", ("paneer", 200.0, "g")),
+    ("paneer - 200 g", ("paneer", 200.0, "g")),
+    ("Poha (1 cup)", ("poha", 240.0, "ml")),
+    ("Tomatoes 3", ("tomato", 3.0, "")),
+])
+def test_trailing_amounts(text, expected):
+    assert parse_ingredients(text) == (expected,)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Green Chillies", "green chilli"),
+    ("curry leaves", "curry leaf"),
+    ("glasses", "glass"),
+    ("radishes", "radish"),
+    ("peaches", "peach"),
+    ("tomatoes", "tomato"),
+    ("berries", "berry"),
+    ("lentils", "lentil"),
+    ("hummus", "hummus"),
+    ("  moong   dal ", "moong dal"),
+])
+def test_normalize_ingredient(name, expected):
+    assert normalize_ingredient(name) == expected
+
+
+def test_separators_split_parts():
+    assert parse_ingredients("200 g paneer, 1 cup poha and 2 tbsp oil; 1 tsp salt + 3 tomatoes") == (
+        ("paneer", 200.0, "g"),
+        ("poha", 240.0, "ml"),
+        ("oil", 30.0, "ml"),
+        ("salt", 5.0, "ml"),
+        ("tomato", 3.0, ""),
+    )
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,000 g rice", (("rice", 1000.0, "g"),)),
+    ("1,500 ml milk, 2 tomatoes", (("milk", 1500.0, "ml"), ("tomato", 2.0, ""))),
+    ("2 onions,3 tomatoes", (("onion", 2.0, ""), ("tomato", 3.0, ""))),
+])
+def test_commas_inside_numbers_are_not_separators(text, expected):
+    assert parse_ingredients(text) == expected
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    ("1 cup", ("poha", 240.0, "ml")),
+    ("200 g", ("poha", 200.0, "g")),
+    ("200gms", ("poha", 200.0, "g")),
+    ("3", ("poha", 3.0, "")),
+    ("2 1/2", ("poha", 2.5, "")),
+])
+def test_quantity_only_is_credited_to_item(quantity, expected):
+    assert meal_ingredients({"item": "Poha", "quantity": quantity}) == (expected,)
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    ("1 bowl", ("poha", 1.0, "serving")),
+    ("2 plates", ("poha", 2.0, "serving")),
+    ("serves 2", ("poha", 2.0, "serving")),
+    ("2 servings", ("poha", 2.0, "serving")),
+    ("1 glass", ("poha", 1.0, "serving")),
+    ("1 katori", ("poha", 1.0, "serving")),
+])
+def test_serving_sizes_are_credited_to_item(quantity, expected):
+    assert meal_ingredients({"item": "Poha", "quantity": quantity}) == (expected,)
+
+
+def test_serving_sizes_never_become_an_ingredient():
+    meals = [{"item": "Poha", "quantity": "1 bowl"}, {"item": "Dal", "quantity": "1 bowl"}]
+    assert grocery_list(meals) == ["poha: 1 serving", "dal: 1 serving"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 cup (240 ml)", (("poha", 240.0, "ml"),)),
+    ("1 cup (240 ml) rice", (("rice", 240.0, "ml"),)),
+    ("200 g (7 oz) paneer", (("paneer", 200.0, "g"),)),
+    ("Poha (1 cup)", (("poha", 240.0, "ml"),)),
+])
+def test_parenthesised_conversions_are_dropped(text, expected):
+    assert parse_ingredients(text, "Poha") == expected
+
+
+def test_bare_unit_is_never_an_ingredient():
+    for text in ("1 cup", "200 g", "50 ml", "1 bowl"):
+        (ingredient, amount, unit), = parse_ingredients(text)
+        assert ingredient == text
+        assert amount is None and unit is None
+
+
+def test_prep_is_kept_alongside_quantity():
+    meal = {"item": "Poha", "quantity": "1 cup", "prep": "Soak  chana overnight"}
+    assert meal_ingredients(meal) == (
+        ("poha", 240.0, "ml"),
+        ("Soak chana overnight", None, None),
+    )
+
+
+@pytest.mark.parametrize("text", ["1/0 cup sugar", "3/0"])
+def test_bad_fractions_are_kept_as_text(text):
+    assert parse_ingredients(text) == ((text, None, None),)
+
+
+@pytest.mark.parametrize("meals, expected", [
+    ([{"item": "Poha", "quantity": "1 cup"}] * 3, ["poha: 3 cups"]),
+    ([{"item": "Poha", "quantity": "1 cup"}], ["poha: 1 cup"]),
+    ([{"item": "Poha", "quantity": "1 cup"}] * 5, ["poha: 5 cups"]),
+    ([{"item": "Poha", "quantity": "1 cup"}] * 30, ["poha: 7.2 l"]),
+    ([{"quantity": "2 tbsp ghee"}] * 3, ["ghee: 6 tbsp"]),
+    ([{"quantity": "1 tsp salt"}] * 5, ["salt: 5 tsp"]),
+    ([{"quantity": "100 ml milk"}] * 3, ["milk: 300 ml"]),
+    ([{"item": "Dal", "quantity": "1 bowl"}] * 2, ["dal: 2 servings"]),
+    ([{"quantity": "500 g paneer"}] * 3, ["paneer: 1.5 kg"]),
+])
+def test_display_units(meals, expected):
+    assert grocery_list(meals) == expected
+
+
+def test_grocery_list_sums_per_ingredient():
+    meals = [
+        {"item": "Poha", "quantity": "1 cup", "prep": "Soak chana"},
+        {"item": "Paneer", "quantity": "200 g"},
+        {"item": "Paneer bhurji", "quantity": "1 kg paneer, 2 tomatoes", "prep": "Soak chana"},
+        {"item": "Salad", "quantity": "3 tomato"},
+    ]
+    assert grocery_list(meals) == [
+        "poha: 1 cup",
+        "Soak chana (x2)",
+        "paneer: 1.2 kg",
+        "tomato: 5",
+    ]
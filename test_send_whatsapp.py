@@ -0,0 +1,318 @@
+import datetime
+import sqlite3
+import sys
+import types
+
+import pytest
+
+import send_whatsapp
+
+dt = datetime.datetime
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "delivery_ledger.db"
+    monkeypatch.setattr(send_whatsapp, "ledger_path", str(path))
+    return path
+
+
+def last_runs(path):
+    with sqlite3.connect(path) as conn:
+        return {job: dt.fromisoformat(slot) for job, slot in conn.execute("SELECT job, last_slot FROM job_runs")}
+
+
+# ---------------- TokenBucket ---------------- #
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock that only moves when TokenBucket sleeps."""
+    state = {"now": 100.0, "slept": []}
+
+    def sleep(seconds):
+        state["slept"].append(seconds)
+        state["now"] += seconds
+
+    monkeypatch.setattr(send_whatsapp.time, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(send_whatsapp.time, "sleep", sleep)
+    return state
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_token_bucket_rejects_non_positive_rate(rate):
+    with pytest.raises(ValueError):
+        send_whatsapp.TokenBucket(rate)
+
+
+def test_token_bucket_bursts_up_to_capacity_without_waiting(clock):
+    bucket = send_whatsapp.TokenBucket(rate=5)
+    for _ in range(5):
+        bucket.acquire()
+    assert clock["slept"] == []
+
+
+def test_token_bucket_throttles_to_rate(clock):
+    bucket = send_whatsapp.TokenBucket(rate=2, capacity=2)
+    start = clock["now"]
+    for _ in range(6):
+        bucket.acquire()
+    # 2 from the initial burst, then 4 more at 2 per second
+    assert clock["now"] - start == pytest.approx(2.0)
+
+
+def test_token_bucket_refills_while_idle(clock):
+    bucket = send_whatsapp.TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    clock["now"] += 10
+    for _ in range(3):
+        bucket.acquire()
+    assert clock["slept"] == []
+
+    # 10 idle seconds still only refill up to capacity
+    bucket.acquire()
+    assert sum(clock["slept"]) == pytest.approx(1.0)
+
+
+# ---------------- Dispatch and ledger ---------------- #
+class FakeClient:
+    """Stands in for twilio.rest.Client; numbers in `failing` raise on send."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+        self.messages = self
+
+    def create(self, body, from_, to):
+        if to in self.failing:
+            raise RuntimeError("provider error")
+        self.sent.append((to.removeprefix("whatsapp:"), body))
+        return types.SimpleNamespace(sid=f"SM{len(self.sent)}")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(send_whatsapp, "get_client", lambda: client)
+    monkeypatch.setattr(send_whatsapp, "recipients", ["+1001", " +1002", "", "+1003"])
+    monkeypatch.setattr(send_whatsapp, "rate_limit_per_sec", 1000.0)
+    return client
+
+
+def test_dispatch_reports_each_recipient(client, ledger):
+    client.failing = {"whatsapp:+1002"}
+    results = send_whatsapp.send_whatsapp_message("hi")
+    assert sorted((number, ok) for number, ok, _ in results) == [("+1001", True), ("+1002", False), ("+1003", True)]
+    assert send_whatsapp.count_failures(results) == 1
+
+
+def test_ledger_skips_recipients_already_sent(client, ledger):
+    today = datetime.date(2026, 10, 16)
+    client.failing = {"whatsapp:+1002"}
+    send_whatsapp.send_whatsapp_message("hi", job="daily", date=today)
+    assert sorted(number for number, _ in client.sent) == ["+1001", "+1003"]
+
+    # A re-run only reaches the recipient that failed
+    client.failing.clear()
+    client.sent.clear()
+    results = send_whatsapp.send_whatsapp_message("hi", job="daily", date=today)
+    assert client.sent == [("+1002", "hi")]
+    assert send_whatsapp.count_failures(results) == 0
+
+    # Nothing is left to send
+    client.sent.clear()
+    assert send_whatsapp.send_whatsapp_message("hi", job="daily", date=today) == []
+    assert client.sent == []
+
+
+def test_ledger_is_keyed_by_job_date_and_content(client, ledger):
+    today = datetime.date(2026, 10, 16)
+    send_whatsapp.send_whatsapp_message("hi", job="daily", date=today)
+    client.sent.clear()
+
+    send_whatsapp.send_whatsapp_message("new plan", job="daily", date=today)
+    send_whatsapp.send_whatsapp_message("hi", job="daily", date=today + datetime.timedelta(days=1))
+    send_whatsapp.send_whatsapp_message("hi", job="weekly", date=today)
+    assert len(client.sent) == 9
+
+
+def test_dispatch_without_job_does_not_use_ledger(client, ledger):
+    send_whatsapp.send_whatsapp_message("hi")
+    send_whatsapp.send_whatsapp_message("hi")
+    assert len(client.sent) == 6
+    assert not ledger.exists()
+
+
+def test_dispatch_renders_distinct_bodies_once(client, ledger):
+    results = send_whatsapp.dispatch({"a": ["+1001", "+1002"], "b": ["+1003"]}, job="daily", date=datetime.date(2026, 10, 16))
+    assert sorted(client.sent) == [("+1001", "a"), ("+1002", "a"), ("+1003", "b")]
+    with sqlite3.connect(ledger) as conn:
+        hashes = {row[0] for row in conn.execute("SELECT DISTINCT content_hash FROM deliveries")}
+    assert hashes == {send_whatsapp.content_hash("a"), send_whatsapp.content_hash("b")}
+    assert len(results) == 3
+
+
+# ---------------- Schedule helpers ---------------- #
+@pytest.mark.parametrize("day, expected", [
+    (datetime.date(2026, 1, 28), (2026, 1, 4)),
+    (datetime.date(2026, 1, 29), (2026, 1, 5)),
+    (datetime.date(2026, 1, 31), (2026, 1, 5)),
+    (datetime.date(2026, 2, 1), (2026, 2, 1)),
+])
+def test_weekly_window_at_month_end(day, expected):
+    assert send_whatsapp.job_window("weekly", day) == expected
+
+
+@pytest.mark.parametrize("job, after, expected", [
+    # February has no day 29 in 2026, so week 5 is skipped
+    ("weekly", dt(2026, 1, 29, 9, 0), dt(2026, 2, 1, 9, 0)),
+    ("weekly", dt(2026, 2, 22, 9, 0), dt(2026, 3, 1, 9, 0)),
+    ("weekly", dt(2028, 2, 22, 9, 0), dt(2028, 2, 29, 9, 0)),
+    ("weekly", dt(2026, 10, 29, 8, 59), dt(2026, 10, 29, 9, 0)),
+    ("daily", dt(2026, 2, 28, 20, 0), dt(2026, 3, 1, 10, 0)),
+    ("daily", dt(2026, 2, 28, 14, 0), dt(2026, 2, 28, 18, 0)),
+    ("monthly", dt(2026, 2, 1, 9, 0), dt(2026, 3, 1, 9, 0)),
+    ("monthly", dt(2026, 12, 31, 23, 0), dt(2027, 1, 1, 9, 0)),
+])
+def test_next_slot(job, after, expected):
+    assert send_whatsapp.next_slot(job, after) == expected
+
+
+@pytest.mark.parametrize("job, at, expected", [
+    ("daily", dt(2026, 3, 1, 9, 0), dt(2026, 2, 28, 20, 0)),
+    ("daily", dt(2026, 3, 1, 10, 0), dt(2026, 3, 1, 10, 0)),
+    ("weekly", dt(2026, 3, 1, 8, 0), dt(2026, 2, 22, 9, 0)),
+    ("monthly", dt(2026, 2, 28, 23, 0), dt(2026, 2, 1, 9, 0)),
+])
+def test_last_slot(job, at, expected):
+    assert send_whatsapp.last_slot(job, at) == expected
+
+
+# ---------------- serve() ---------------- #
+class Scheduler:
+    """Runs serve() against a fake clock and fake jobs."""
+
+    def __init__(self, monkeypatch):
+        self.now = None
+        self.stop = None
+        self.jumps = []
+        self.calls = []
+        self.failures = {}  # job -> number of upcoming runs that fail
+        monkeypatch.setattr(send_whatsapp, "_now", lambda: self.now)
+        monkeypatch.setattr(send_whatsapp.time, "sleep", self.sleep)
+        monkeypatch.setitem(sys.modules, "plan_builder", types.SimpleNamespace(load_plan=lambda: {}))
+        for job in list(send_whatsapp.JOBS):
+            monkeypatch.setitem(send_whatsapp.JOBS, job, self._job(job))
+
+    def _job(self, job):
+        def run(plan=None):
+            self.calls.append((job, self.now))
+            if self.failures.get(job, 0):
+                self.failures[job] -= 1
+                return 1
+            return 0
+        return run
+
+    def sleep(self, seconds):
+        if self.now >= self.stop:
+            raise KeyboardInterrupt
+        self.now += datetime.timedelta(seconds=seconds)
+        if self.jumps:
+            self.now += self.jumps.pop(0)
+
+    def serve(self, start, stop=None):
+        self.calls.clear()
+        self.now, self.stop = start, stop or start
+        send_whatsapp.serve()
+        return self.calls
+
+
+@pytest.fixture
+def scheduler(ledger, monkeypatch):
+    return Scheduler(monkeypatch)
+
+
+def test_first_start_records_baseline_without_running(scheduler, ledger):
+    assert scheduler.serve(dt(2026, 10, 16, 15, 0)) == []
+    assert last_runs(ledger) == {
+        "daily": dt(2026, 10, 16, 14, 0),
+        "weekly": dt(2026, 10, 15, 9, 0),
+        "monthly": dt(2026, 10, 1, 9, 0),
+    }
+
+
+def test_restart_after_midnight_skips_yesterdays_missed_slot(scheduler, ledger):
+    scheduler.serve(dt(2026, 10, 16, 19, 0))
+    assert scheduler.serve(dt(2026, 10, 17, 1, 0)) == []
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 16, 18, 0)
+
+
+def test_restart_catches_up_slot_in_current_window(scheduler, ledger):
+    scheduler.serve(dt(2026, 10, 16, 11, 0))
+    assert scheduler.serve(dt(2026, 10, 16, 19, 0)) == [("daily", dt(2026, 10, 16, 19, 0))]
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 16, 18, 0)
+
+
+def test_restart_catches_up_weekly_only_within_its_week(scheduler, ledger):
+    scheduler.serve(dt(2026, 2, 21, 12, 0))
+    # Feb 22 09:00 was missed; on Feb 28 the week is still current, on Mar 1 it is not
+    assert ("weekly", dt(2026, 2, 28, 12, 0)) in scheduler.serve(dt(2026, 2, 28, 12, 0))
+
+    scheduler.serve(dt(2026, 2, 21, 12, 0))
+    with sqlite3.connect(ledger) as conn:
+        conn.execute("UPDATE job_runs SET last_slot = ? WHERE job = 'weekly'", (dt(2026, 2, 15, 9, 0).isoformat(),))
+    calls = scheduler.serve(dt(2026, 3, 1, 8, 0))
+    assert not [call for call in calls if call[0] == "weekly"]
+
+
+def test_failed_run_is_not_recorded_and_retried(scheduler, ledger, monkeypatch):
+    monkeypatch.setattr(send_whatsapp, "job_retry_seconds", 900)
+    scheduler.serve(dt(2026, 10, 16, 11, 0))
+    scheduler.failures["daily"] = 1
+
+    calls = scheduler.serve(dt(2026, 10, 16, 15, 0), stop=dt(2026, 10, 16, 15, 10))
+    assert calls == [("daily", dt(2026, 10, 16, 15, 0))]
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 16, 10, 0)
+
+    calls = scheduler.serve(dt(2026, 10, 16, 15, 20), stop=dt(2026, 10, 16, 15, 40))
+    assert calls == [("daily", dt(2026, 10, 16, 15, 20))]
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 16, 14, 0)
+
+
+def test_retry_runs_after_delay_while_serving(scheduler, ledger, monkeypatch):
+    monkeypatch.setattr(send_whatsapp, "job_retry_seconds", 900)
+    scheduler.serve(dt(2026, 10, 16, 9, 0))
+    scheduler.failures["daily"] = 1
+
+    calls = scheduler.serve(dt(2026, 10, 16, 9, 0), stop=dt(2026, 10, 16, 11, 0))
+    assert calls == [("daily", dt(2026, 10, 16, 10, 0)), ("daily", dt(2026, 10, 16, 10, 15))]
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 16, 10, 0)
+
+
+def test_only_one_retry_is_pending_per_job(scheduler, ledger, monkeypatch):
+    monkeypatch.setattr(send_whatsapp, "job_retry_seconds", 3 * 3600)
+    scheduler.serve(dt(2026, 10, 16, 9, 0))
+    scheduler.failures["daily"] = 100
+
+    calls = scheduler.serve(dt(2026, 10, 16, 9, 0), stop=dt(2026, 10, 16, 21, 0))
+    # Regular slots at 10/14/18/20; retries only from a failure with no retry already queued
+    assert [when.hour for job, when in calls] == [10, 13, 14, 16, 18, 19, 20]
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 15, 20, 0)
+
+
+def test_slot_whose_window_passed_is_skipped(scheduler, ledger):
+    scheduler.serve(dt(2026, 10, 16, 19, 0))
+    # The machine sleeps through the 20:00 slot and wakes two days later
+    scheduler.jumps = [datetime.timedelta(days=2)]
+
+    calls = scheduler.serve(dt(2026, 10, 16, 19, 59), stop=dt(2026, 10, 18, 20, 0))
+    assert calls == [("daily", dt(2026, 10, 18, 20, 0))]
+
+
+def test_slot_missed_during_sleep_runs_if_its_window_is_current(scheduler, ledger):
+    scheduler.serve(dt(2026, 10, 16, 13, 0))
+    # Asleep from 13:59 to 19:00: 14:00 and 18:00 pass, only the latest is run
+    scheduler.jumps = [datetime.timedelta(hours=5)]
+
+    calls = scheduler.serve(dt(2026, 10, 16, 13, 59), stop=dt(2026, 10, 16, 19, 30))
+    assert calls == [("daily", dt(2026, 10, 16, 19, 0))]
+    assert last_runs(ledger)["daily"] == dt(2026, 10, 16, 18, 0)